@@ -0,0 +1,18 @@
+"""Shared loguru setup for the examples in this directory.
+
+Records are handed to a background thread through a queue (enqueue=True), so
+writing to stderr never blocks the code that logs - which matters once several
+agent runs are awaited concurrently.
+
+Usage:
+    from _logging import log
+"""
+
+import sys
+
+from loguru import logger as log
+
+log.remove()
+log.add(sys.stderr, level="INFO", enqueue=True, backtrace=False, diagnose=False)
+
+__all__ = ["log"]
@@ -0,0 +1,59 @@
+"""
+Shared Bielik model and agents for the examples in this directory.
+
+The model connection and both agents are created once here and imported by the
+example scripts, instead of every script building its own copies.
+
+Usage:
+    from _model import agent_no_tools as agent
+    from _model import agent_with_tools as agent
+"""
+
+import os
+
+from dotenv import load_dotenv
+from llm_cache import CachedModel
+from pydantic_ai import Agent
+from pydantic_ai.models.openai import OpenAIChatModel
+from pydantic_ai.providers.ollama import OllamaProvider
+from pydantic_ai.settings import ModelSettings
+
+# Load environment variables from .env file (LLM_BASE_URL / LLM_MODEL_NAME may be set there)
+load_dotenv(override=True)
+
+# Configuration of the Bielik model through Ollama
+# ================================================
+# - model_name: The identifier of the model as registered in Ollama
+# - provider: OllamaProvider connects to a locally running Ollama instance
+# - base_url: The endpoint where Ollama is serving the model (default: localhost:11434)
+#   This assumes you've already started Ollama and pulled the bielik model locally
+# - The bielik_v3_q8_tools version supports tool calling; the Modelfile in this
+#   directory specifies the tool calling format and sets temperature to 0.1
+# - LLM_BASE_URL / LLM_MODEL_NAME point the same model at any other OpenAI-compatible
+#   server instead, e.g. vLLM for concurrent workloads (see README)
+ollama_model = OpenAIChatModel(
+    model_name=os.getenv("LLM_MODEL_NAME", "bielik_v3_q8_tools"),
+    provider=OllamaProvider(base_url=os.getenv("LLM_BASE_URL", "http://localhost:11434/v1")),
+)
+
+# Agent for plain inference (bielik_basic_inference.py)
+# =====================================================
+# An Agent is the main interface for interacting with the LLM. It:
+# - Wraps the language model
+# - Manages conversation context and message history
+# - Can be equipped with tools (see agent_with_tools below)
+# - system_prompt: Instructions that guide the model's behavior and tone
+#   (In this case: "Respond concisely and briefly" in Polish)
+# - CachedModel: with temperature=0 the answer to the same prompt is deterministic,
+#   so it's stored in ./.llm_cache and re-runs are answered from disk (see llm_cache.py)
+agent_no_tools = Agent(
+    CachedModel(ollama_model),
+    system_prompt="Jesteś asystentem AI odpowiadającym krótko i zwięźle",
+    model_settings=ModelSettings(temperature=0),
+)
+
+# Agent for tool calling (bielik_basic_tools.py)
+# ==============================================
+# Tools are registered on it by the script with the @agent.tool decorator
+# (system prompt: "You are a helpful AI assistant" in Polish)
+agent_with_tools = Agent(ollama_model, system_prompt="Jesteś pomocnym asystentem AI")
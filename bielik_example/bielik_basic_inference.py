@@ -12,31 +12,13 @@ The Bielik model is a Polish language LLM based on Llama, which makes it excelle
 for Polish language understanding and generation tasks.
 """
 
-from loguru import logger as log
+from _logging import log
+from _model import agent_no_tools as agent
 from pydantic_ai import Agent
-from pydantic_ai.models.openai import OpenAIChatModel
-from pydantic_ai.providers.ollama import OllamaProvider
 
-# Configuration of the Bielik model through Ollama
-# ================================================
-# - model_name: The identifier of the model as registered in Ollama
-# - provider: OllamaProvider connects to a locally running Ollama instance
-# - base_url: The endpoint where Ollama is serving the model (default: localhost:11434)
-#   This assumes you've already started Ollama and pulled the bielik model locally
-ollama_model = OpenAIChatModel(
-    model_name="bielik_v3_q8_tools",
-    provider=OllamaProvider(base_url="http://localhost:11434/v1"),
-)
-
-# Create a PydanticAI Agent
-# =========================
-# An Agent is the main interface for interacting with the LLM. It:
-# - Wraps the language model
-# - Manages conversation context and message history
-# - Can be equipped with tools (see bielik_basic_tools.py for advanced usage)
-# - system_prompt: Instructions that guide the model's behavior and tone
-#   (In this case: "Respond concisely and briefly" in Polish)
-agent = Agent(ollama_model, system_prompt="Jesteś asystentem AI odpowiadającym krótko i zwięźle")
+# The model connection and the agent are shared with the other examples (see _model.py):
+# - the agent has a short system prompt ("Respond concisely and briefly" in Polish)
+# - with temperature=0 its answers are cached in ./.llm_cache (see llm_cache.py)
 
 
 async def main(agent: Agent = agent) -> None:
@@ -52,9 +34,9 @@ async def main(agent: Agent = agent) -> None:
         agent: The PydanticAI Agent instance to use for inference
     """
 
-    # Run a synchronous request to the agent
-    # run_sync() blocks until the model completes its response
-    # Unlike run() which is asynchronous, this is simpler for basic use cases
+    # Run the request and wait for the complete answer
+    # It isn't streamed: the answer may come from CachedModel, which serves
+    # whole responses (streamed requests would bypass the cache)
     result = await agent.run("Cześć, kim jesteś?")  # "Hello, who are you?" in Polish
 
     # Log the model's response
@@ -69,4 +51,10 @@ async def main(agent: Agent = agent) -> None:
 if __name__ == "__main__":
     import asyncio
 
-    asyncio.run(main())
+    try:
+        # uvloop is a faster drop-in event loop; it isn't available on Windows
+        from uvloop import new_event_loop
+    except ImportError:
+        new_event_loop = None
+
+    asyncio.run(main(), loop_factory=new_event_loop)
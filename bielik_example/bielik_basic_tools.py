@@ -19,23 +19,33 @@ This demonstrates how modern LLMs can be enhanced with real-world capabilities
 by integrating them with external APIs and services.
 """
 
+import asyncio
 import os
 import secrets
+import time
 from typing import Any
 
 import httpx
+import orjson
+from _logging import log
+from _model import agent_with_tools as agent
 from dotenv import load_dotenv
 from icecream import ic
-from loguru import logger as log
-from pydantic_ai import Agent, RunContext
-from pydantic_ai.models.openai import OpenAIChatModel
-from pydantic_ai.providers.ollama import OllamaProvider
+from pydantic_ai import Agent, AgentRunResult, RunContext
+from pydantic_ai.messages import ModelMessage
 
 # Load environment variables from .env file
 # WEATHER_API_KEY should be set here for the weather tool to work
 load_dotenv(override=True)
 
 
+# Debug Output
+# ============
+# ic() inspects the caller's frame and source on every call, so the tool traces
+# are only printed when BIELIK_DEBUG is set (e.g. BIELIK_DEBUG=1 in .env)
+if not os.getenv("BIELIK_DEBUG"):
+    ic.disable()
+
 # API Configuration
 # =================
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
@@ -44,22 +54,85 @@ if not WEATHER_API_KEY:
         "WEATHER_API_KEY environment variable is not set. Please define it (e.g., in your .env file) so the weather tool can work."
     )
 
-# Ollama Model Configuration
-# ===========================
-# The Bielik model needs to be properly configured for tool calling:
-# - Use a version that supports tool calling (e.g., bielik_v3_q8_tools)
-# - The Modelfile in this directory specifies the tool calling format
-# - Temperature is set to 0.1 for more deterministic outputs during tool calling
-ollama_model = OpenAIChatModel(
-    model_name="bielik_v3_q8_tools",
-    provider=OllamaProvider(base_url="http://localhost:11434/v1"),
+
+class CachingTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that keeps successful GET responses in memory for a short time.
+
+    Agents often ask for the same data more than once in a session (e.g. the weather
+    in the same city), so repeated identical requests within `ttl` seconds are answered
+    from memory instead of going over the network.
+
+    Expired responses are dropped when they're looked up, and at most `max_entries`
+    responses are kept (the oldest go first). Credential query parameters (e.g. the
+    API `key`) are left out of the cache key, so secrets aren't kept in memory.
+    """
+
+    # Query parameters carrying credentials - not part of the cache key
+    CREDENTIAL_PARAMS = ("key", "api_key", "apikey", "access_token", "token")
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, ttl: float = 60.0, max_entries: int = 256) -> None:
+        self.transport = transport
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache: dict[str, tuple[float, int, httpx.Headers, bytes]] = {}
+
+    def cache_key(self, request: httpx.Request) -> str:
+        url = request.url
+        for param in self.CREDENTIAL_PARAMS:
+            url = url.copy_remove_param(param)
+        return str(url)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self.transport.handle_async_request(request)
+
+        key = self.cache_key(request)
+        if cached := self._cache.get(key):
+            if cached[0] > time.monotonic():
+                _, status_code, headers, content = cached
+                return httpx.Response(status_code, headers=headers, content=content, request=request)
+            del self._cache[key]
+
+        response = await self.transport.handle_async_request(request)
+        if response.status_code != 200:
+            return response
+
+        # Keep the raw (still encoded) body, the client decodes it as usual
+        content = b"".join([chunk async for chunk in response.stream])  # type: ignore[union-attr]
+        await response.aclose()
+        if len(self._cache) >= self.max_entries:
+            # Drop the oldest entry - dicts keep insertion order
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = (time.monotonic() + self.ttl, response.status_code, response.headers, content)
+        return httpx.Response(response.status_code, headers=response.headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+# Shared HTTP client for tool calls
+# =================================
+# A single client keeps connections alive between tool calls, so repeated
+# weather lookups don't pay for a new TCP + TLS handshake every time.
+# Identical lookups within a minute are served by CachingTransport without a request.
+# It's closed at the end of main().
+http_client = httpx.AsyncClient(
+    timeout=10.0,
+    transport=CachingTransport(httpx.AsyncHTTPTransport(limits=httpx.Limits(max_keepalive_connections=10)), ttl=60.0),
 )
 
-# Create the Agent with tools
-# ============================
+# Random number source for the dice tool
+# ======================================
+# SystemRandom draws from the OS entropy pool (the same source `secrets` uses)
+# and is created once instead of on every tool call
+dice_rng = secrets.SystemRandom()
+
+# Agent with tools
+# ================
+# The model connection and the agent are shared with the other examples (see _model.py).
 # The @agent.tool decorator registers functions as tools available to the model.
 # The agent will analyze when to call these tools based on user requests.
-agent = Agent(ollama_model, system_prompt="Jesteś pomocnym asystentem AI")
 
 
 @agent.tool
@@ -76,8 +149,8 @@ async def roll_dice(ctx: RunContext[None]) -> int:
     Returns:
         int: A random integer between 1 and 6 (inclusive)
     """
-    # Use secrets for cryptographically secure random selection
-    output = secrets.choice([1, 2, 3, 4, 5, 6])
+    # Cryptographically secure random selection from the shared SystemRandom
+    output = dice_rng.randint(1, 6)
 
     # Debug logging to show when the tool is called and what it returns
     ic(f"[TOOL CALL] Output from tool '{roll_dice.__name__}'")
@@ -120,29 +193,70 @@ async def check_weather(ctx: RunContext[None], city: str) -> Any:
         "aqi": "no",  # Disable air quality data for simpler response
     }
 
-    # Make asynchronous HTTP request using httpx client
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params)
+    # Make asynchronous HTTP request using the shared httpx client
+    response = await http_client.get(url, params=params)
+
+    if response.status_code == 200:
+        # Successfully retrieved weather data, parsed straight from the raw bytes with orjson
+        data = orjson.loads(response.content)
 
-        if response.status_code == 200:
-            # Successfully retrieved weather data
-            data = response.json()
+        # Extract relevant fields from the API response
+        # This simplification makes the data more digestible for the LLM
+        output = {
+            "location": data["location"]["name"],
+            "temp_c": data["current"]["temp_c"],
+            "condition": data["current"]["condition"]["text"],
+        }
 
-            # Extract relevant fields from the API response
-            # This simplification makes the data more digestible for the LLM
-            output = {
-                "location": data["location"]["name"],
-                "temp_c": data["current"]["temp_c"],
-                "condition": data["current"]["condition"]["text"],
-            }
+        # Debug logging
+        ic(f"[TOOL CALL] Output from tool '{check_weather.__name__}'")
+        ic(output)
+        return output
+    else:
+        # Handle API errors gracefully
+        return f"Error: Could not find weather for {city}. Status: {response.status_code}"
 
-            # Debug logging
-            ic(f"[TOOL CALL] Output from tool '{check_weather.__name__}'")
-            ic(output)
-            return output
-        else:
-            # Handle API errors gracefully
-            return f"Error: Could not find weather for {city}. Status: {response.status_code}"
+
+async def stream_turn(agent: Agent, prompt: str, message_history: list[ModelMessage] | None = None) -> list[ModelMessage]:
+    """
+    Run a single conversation turn, printing the answer while it is generated.
+
+    Tool calls are still executed before the final answer; only the text of that
+    answer is streamed, so the first words show up as soon as the model emits them
+    instead of after the whole response is decoded.
+
+    Args:
+        agent: The PydanticAI Agent instance to run the turn with
+        prompt: The user message for this turn
+        message_history: Messages from previous turns, if any
+
+    Returns:
+        list[ModelMessage]: The full conversation history including this turn
+    """
+    log.info(prompt)
+    async with agent.run_stream(prompt, message_history=message_history) as result:
+        async for text in result.stream_text(delta=True):
+            print(text, end="", flush=True)
+    print()
+    return result.all_messages()
+
+
+async def batch_run(agent: Agent, prompts: list[str], message_history: list[ModelMessage] | None = None) -> list[AgentRunResult[str]]:
+    """
+    Run prompts that don't depend on each other's answers concurrently.
+
+    All requests are in flight at the same time, so a server with continuous
+    batching (e.g. vLLM) processes them together instead of one after another.
+
+    Args:
+        agent: The PydanticAI Agent instance to run the prompts with
+        prompts: Independent user messages
+        message_history: History shared by all prompts, if any
+
+    Returns:
+        list[AgentRunResult[str]]: One result per prompt, in the same order
+    """
+    return await asyncio.gather(*(agent.run(prompt, message_history=message_history) for prompt in prompts))
 
 
 async def main(agent: Agent = agent) -> None:
@@ -153,51 +267,67 @@ async def main(agent: Agent = agent) -> None:
     1. Make the first request to establish context
     2. Pass message history to maintain conversation context
     3. Have the agent use tools when appropriate
-    4. Access and log the agent's reasoning and tool calls
+    4. Send independent requests at the same time
+    5. Access and log the agent's reasoning and tool calls
 
-    The three prompts demonstrate:
+    The three conversation prompts demonstrate:
     - Prompt 1: Basic greeting (no tool needed)
     - Prompt 2: Requesting tool use (roll_dice)
     - Prompt 3: Requesting tool use with parameters (check_weather)
+
+    Every turn resends the whole history, so keep messages from previous turns
+    unchanged: Ollama then only has to process the new tokens of each turn,
+    reusing the cached prefix as long as the model stays loaded (see README).
     """
 
-    # First turn: Greeting
-    # ====================
-    # This initial message establishes context and allows the model to introduce itself
-    prompt_1 = "Cześć, kim jesteś?"  # "Hello, who are you?" in Polish
-    result_1 = await agent.run(prompt_1)
-    log.info(prompt_1)
-    log.info(f"Response: {result_1.output}")
-
-    # Second turn: Tool calling - roll_dice
-    # ======================================
-    # Pass the message history from the previous turn to maintain context
-    # The agent will understand it's continuing a conversation and can use tools
-    prompt_2 = "Rzuć kostką i podaj wynik!"  # "Roll a dice and tell me the result!" in Polish
-    result_2 = await agent.run(prompt_2, message_history=result_1.all_messages())
-    log.info(prompt_2)
-    log.info(f"Response: {result_2.output}")
-
-    # Optional: Inspect all messages including tool calls
-    # This shows the full conversation including tool call requests and responses
-    # Uncomment to see the detailed message structure:
-    # ic(result_2.all_messages())
-
-    # Third turn: Tool calling - check_weather
-    # =========================================
-    # Continue the conversation with another tool-requiring request
-    prompt_3 = "Sprawdź pogodę w Warszawie, proszę Cię!"  # "Check the weather in Warsaw, please!" in Polish
-    result_3 = await agent.run(prompt_3, message_history=result_2.all_messages())
-    log.info(prompt_3)
-    log.info(f"Response: {result_3.output}")
-
-    # Optional: Inspect the full message history
-    # This includes the agent's tool call request and the tool result
-    # Uncomment to see exactly what the agent sent and received:
-    # ic(result_3.all_messages())
+    try:
+        # First turn: Greeting
+        # ====================
+        # This initial message establishes context and allows the model to introduce itself
+        prompt_1 = "Cześć, kim jesteś?"  # "Hello, who are you?" in Polish
+        history = await stream_turn(agent, prompt_1)
+
+        # Second turn: Tool calling - roll_dice
+        # ======================================
+        # Pass the message history from the previous turn to maintain context
+        # The agent will understand it's continuing a conversation and can use tools
+        prompt_2 = "Rzuć kostką i podaj wynik!"  # "Roll a dice and tell me the result!" in Polish
+        history = await stream_turn(agent, prompt_2, message_history=history)
+
+        # Third turn: Tool calling - check_weather
+        # =========================================
+        # Continue the conversation with another tool-requiring request
+        prompt_3 = "Sprawdź pogodę w Warszawie, proszę Cię!"  # "Check the weather in Warsaw, please!" in Polish
+        history = await stream_turn(agent, prompt_3, message_history=history)
+
+        # Optional: Inspect all messages including tool calls
+        # This shows the full conversation including tool call requests and responses
+        # Uncomment to see the detailed message structure:
+        # ic(history)
+
+        # Independent requests: check_weather for several cities
+        # =======================================================
+        # These prompts don't depend on each other or on the conversation above, so
+        # they're sent at once, each as a new conversation without history. A batching
+        # server like vLLM processes them together. Their answers are separate
+        # conversations and are not added to the history of the conversation above.
+        prompts = [
+            "Sprawdź pogodę w Krakowie!",  # "Check the weather in Kraków!" in Polish
+            "Sprawdź pogodę w Gdańsku!",  # "Check the weather in Gdańsk!" in Polish
+        ]
+        for prompt, result in zip(prompts, await batch_run(agent, prompts), strict=True):
+            log.info(prompt)
+            log.info(f"Response: {result.output}")
+    finally:
+        # Release pooled connections of the shared HTTP client
+        await http_client.aclose()
 
 
 if __name__ == "__main__":
-    import asyncio
+    try:
+        # uvloop is a faster drop-in event loop; it isn't available on Windows
+        from uvloop import new_event_loop
+    except ImportError:
+        new_event_loop = None
 
-    asyncio.run(main())
+    asyncio.run(main(), loop_factory=new_event_loop)
@@ -0,0 +1,113 @@
+"""
+Content-addressed cache for deterministic model responses
+
+Re-running an example asks the model the very same questions every time.
+When a request is deterministic (temperature == 0) its response can be stored
+on disk and served from there on the next run - no tokens spent, and the
+answer arrives in milliseconds instead of seconds.
+
+The cache key is a SHA-256 hash of everything that influences the response:
+model name, message history, model settings and tool definitions. Fields that
+change on every run without changing the prompt (timestamps, run and
+conversation ids) are left out of the key.
+
+A response served from the cache reports zero token usage, since no tokens
+were spent on it.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+
+from _logging import log
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models import KnownModelName, Model, ModelRequestParameters
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings, merge_model_settings
+from pydantic_ai.usage import RequestUsage
+from pydantic_core import to_jsonable_python
+
+# Keys which differ between runs for otherwise identical requests
+VOLATILE_KEYS = frozenset({"timestamp", "run_id", "conversation_id"})
+
+
+def _strip_volatile(value: Any) -> Any:
+    """Recursively drop run-specific keys so identical prompts hash the same."""
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+class CachedModel(WrapperModel):
+    """Model wrapper serving deterministic (temperature == 0) requests from a disk cache.
+
+    Args:
+        wrapped: The model (or model name) to send cache misses to
+        cache_dir: Directory where cached responses are stored
+        ttl: Time in seconds after which a cached response expires
+    """
+
+    def __init__(self, wrapped: Model | KnownModelName, cache_dir: Path | str = ".llm_cache", ttl: float = 24 * 60 * 60):
+        super().__init__(wrapped)
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+    def cache_key(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> str:
+        """Build the SHA-256 key identifying a request."""
+        payload = {
+            "model": self.model_name,
+            "messages": _strip_volatile(ModelMessagesTypeAdapter.dump_python(messages, mode="json")),
+            "settings": to_jsonable_python(model_settings, fallback=repr),
+            "parameters": to_jsonable_python(model_request_parameters, fallback=repr),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        settings = merge_model_settings(self.wrapped.settings, model_settings)
+
+        # Sampled responses differ between calls, caching them would change behavior
+        if not settings or settings.get("temperature") != 0:
+            return await super().request(messages, model_settings, model_request_parameters)
+
+        cache_path = self.cache_dir / f"{self.cache_key(messages, settings, model_request_parameters)}.json"
+        # File access runs in a worker thread, so concurrent runs aren't blocked by disk I/O
+        cached = await asyncio.to_thread(self.read_cached, cache_path)
+        if cached is not None:
+            log.info(f"Response served from cache {cache_path} - no tokens spent")
+            response = ModelMessagesTypeAdapter.validate_json(cached)[0]
+            # The stored usage was spent by the original request, not by this one
+            return replace(response, usage=RequestUsage())  # type: ignore[return-value]
+
+        response = await super().request(messages, model_settings, model_request_parameters)
+        await asyncio.to_thread(self.write_cached, cache_path, ModelMessagesTypeAdapter.dump_json([response]))
+        return response
+
+    def read_cached(self, cache_path: Path) -> bytes | None:
+        """Return the stored response, or None if there is none or it has expired."""
+        try:
+            if time.time() - cache_path.stat().st_mtime >= self.ttl:
+                return None
+            return cache_path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write_cached(self, cache_path: Path, data: bytes) -> None:
+        """Store a response in the cache directory."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        cache_path.write_bytes(data)
@@ -1,15 +1,52 @@
+import hashlib
+import json
+from dataclasses import replace
+from pathlib import Path
+
 from dotenv import load_dotenv
-from pydantic_ai import ModelRequest
+from pydantic_ai import ModelRequest, ModelResponse
 from pydantic_ai.direct import model_request_sync
+from pydantic_ai.messages import ModelMessagesTypeAdapter
+from pydantic_ai.settings import ModelSettings
+from pydantic_ai.usage import RequestUsage
 
 load_dotenv()
 
+# Deterministic (temperature=0) responses are stored here, so re-runs don't call the API
+CACHE_DIR = Path(".llm_cache")
+
+
+def cached_request(model: str, prompt: str, model_settings: ModelSettings) -> ModelResponse:
+    """Send a direct model request, reusing the stored response of an identical earlier one.
+
+    Args:
+        model: Name of the model to send the request to
+        prompt: User prompt of the request
+        model_settings: Settings of the request, part of the cache key
+
+    Returns:
+        The model's response; a cached one reports zero token usage
+    """
+    key = hashlib.sha256(json.dumps([model, prompt, model_settings], sort_keys=True).encode()).hexdigest()
+    cache_path = CACHE_DIR / f"{key}.json"
+    if cache_path.exists():
+        print("(answered from ./.llm_cache - no tokens spent)")
+        response = ModelMessagesTypeAdapter.validate_json(cache_path.read_bytes())[0]
+        return replace(response, usage=RequestUsage())  # type: ignore[return-value]
+
+    response = model_request_sync(model, [ModelRequest.user_text_prompt(prompt)], model_settings=model_settings)
+    CACHE_DIR.mkdir(exist_ok=True)
+    cache_path.write_bytes(ModelMessagesTypeAdapter.dump_json([response]))
+    return response
+
 
 def basic_sync_example():
     """Basic synchronous direct model request."""
     prompt = "What is the capital of France? Answer briefly."
     print("Basic Synchronous Direct Model Request\n")
-    response = model_request_sync("openai:gpt-5.2", [ModelRequest.user_text_prompt(prompt)])
+    # With temperature=0 the answer is deterministic, so repeated runs
+    # are served from ./.llm_cache instead of calling the API again
+    response = cached_request("openai:gpt-5.2", prompt, ModelSettings(temperature=0))
     print(f"Request: {prompt}")
     print(f"Response: {response.parts[0].content}")
     print(f"Usage: {response.usage}")
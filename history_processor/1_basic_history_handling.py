@@ -8,9 +8,9 @@ Demonstrates how to inspect and access conversation history in different formats
 This is a foundational example showing how history is stored and accessed.
 """
 
+from _logging import log
 from dotenv import load_dotenv
 from icecream import ic
-from loguru import logger as log
 from pydantic_ai import Agent
 
 load_dotenv()
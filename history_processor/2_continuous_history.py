@@ -9,9 +9,9 @@ Demonstrates maintaining context across multiple agent calls:
 This example shows the fundamental pattern for stateful conversations.
 """
 
+from _logging import log
 from dotenv import load_dotenv
 from icecream import ic
-from loguru import logger as log
 from pydantic_ai import Agent
 from pydantic_ai.messages import ModelMessage
 
@@ -23,24 +23,29 @@ def main() -> None:
     # Create agent
     agent = Agent(model="openai:gpt-5.1", system_prompt="Be a helpful assistant")
 
+    # Conversation history, extended with each turn's new messages only
+    history: list[ModelMessage] = []
+
     # First turn: Agent generates a joke
     prompt_1 = "Provide a really, really funny joke. Respond in plain text."
     result_1 = agent.run_sync(prompt_1)
+    history.extend(result_1.new_messages())
     log.info("\n=== Turn 1 ===")
     log.info(f"Prompt: {prompt_1}")
     log.info(f"Answer: {result_1.output}")
 
     # Second turn: Pass history to context for follow-up
-    # Using new_messages() to pass only messages from first inference
+    # new_messages() holds only the messages produced by a single run, so the
+    # accumulated history grows by one turn at a time instead of being rebuilt
     prompt_2 = "I didn't get it. Care to explain?"
-    result_2 = agent.run_sync(prompt_2, message_history=result_1.new_messages())
+    result_2 = agent.run_sync(prompt_2, message_history=history)
+    history.extend(result_2.new_messages())
     log.info("\n=== Turn 2 ===")
     log.info(f"Prompt: {prompt_2}")
     log.info(f"Answer: {result_2.output}")
 
-    # Inspect full conversation history
+    # Inspect full conversation history (same as result_2.all_messages())
     log.info("\n=== Complete Conversation History ===")
-    history: list[ModelMessage] = result_2.all_messages()
     log.info(f"Total messages: {len(history)}")
     for idx, message in enumerate(history):
         log.info(f"\nMessage #{idx + 1}: {type(message).__name__}")
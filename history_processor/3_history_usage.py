@@ -9,33 +9,40 @@ Demonstrates practical history applications:
 This example shows production-ready patterns for history management.
 """
 
+import asyncio
+from pathlib import Path
+
+from _logging import log
 from dotenv import load_dotenv
 from icecream import ic
-from loguru import logger as log
 from pydantic_ai import Agent
-from pydantic_ai.messages import ModelMessage
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
 
 load_dotenv()
 
 
-def main() -> None:
+async def main() -> None:
     """Run multi-turn conversation with persistence example."""
     # Create agent
     agent = Agent(model="openai:gpt-5.1", system_prompt="Be a helpful assistant")
 
     # Turn 1: Get initial motto
     log.info("\n=== Turn 1 ===")
-    result_1 = agent.run_sync("Provide me with a good motto for today!")
+    result_1 = await agent.run("Provide me with a good motto for today!")
+    history: list[ModelMessage] = result_1.new_messages()
     log.info(f"Answer: {result_1.output}")
 
     # Turn 2: Explain the choice
+    # Every turn continues the conversation so far, so turns run one after another
     log.info("\n=== Turn 2 ===")
-    result_2 = agent.run_sync("Why did you choose this one? Please explain it a bit more.", message_history=result_1.all_messages())
+    result_2 = await agent.run("Why did you choose this one? Please explain it a bit more.", message_history=history)
+    history.extend(result_2.new_messages())
     log.info(f"Answer: {result_2.output}")
 
     # Turn 3: Request another motto
     log.info("\n=== Turn 3 ===")
-    result_3 = agent.run_sync("Wow, thanks a lot! How about another one for my friend?", message_history=result_2.all_messages())
+    result_3 = await agent.run("Wow, thanks a lot! How about another one for my friend?", message_history=history)
+    history.extend(result_3.new_messages())
     log.info(f"Answer: {result_3.output}")
 
     # Turn 4: Summarize conversation
@@ -44,12 +51,12 @@ def main() -> None:
         "Please summarize the whole conversation until this message. "
         "Point out key topics and provide a timeline of events from this conversation."
     )
-    result_4 = agent.run_sync(summary_prompt, message_history=result_3.all_messages())
+    result_4 = await agent.run(summary_prompt, message_history=history)
+    history.extend(result_4.new_messages())
     log.info(f"Summary: {result_4.output}")
 
     # Inspect full history
     log.info("\n=== Complete History ===")
-    history: list[ModelMessage] = result_4.all_messages()
     log.info(f"Total messages: {len(history)}")
     for idx, message in enumerate(history):
         log.info(f"\nMessage #{idx + 1}: {type(message).__name__}")
@@ -57,12 +64,20 @@ def main() -> None:
 
     # Persist history for use in example 4
     log.info("\n=== Saving to File ===")
-    history_json = result_4.all_messages_json()
-    save_path = "./output_3.json"
-    with open(save_path, "wb") as f:
-        f.write(history_json)
+    # Serialize the accumulated history in one pass with pydantic-core, the
+    # counterpart of validate_json used when loading it in the next examples
+    history_json = ModelMessagesTypeAdapter.dump_json(history)
+    save_path = Path("./output_3.json")
+    # Write in a worker thread so the event loop isn't blocked by disk I/O
+    await asyncio.to_thread(save_path.write_bytes, history_json)
     log.info(f"History saved to {save_path}")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        # uvloop is a faster drop-in event loop; it isn't available on Windows
+        from uvloop import new_event_loop
+    except ImportError:
+        new_event_loop = None
+
+    asyncio.run(main(), loop_factory=new_event_loop)
@@ -9,16 +9,18 @@ Demonstrates advanced history processing:
 This example shows how to selectively use conversation history.
 """
 
-import json
-
+from _history_store import load_history
+from _logging import log
 from dotenv import load_dotenv
-from loguru import logger as log
 from pydantic_ai import Agent, ModelMessage, ModelRequest, ModelResponse
-from pydantic_ai.messages import ModelMessagesTypeAdapter
 
 load_dotenv()
 
 
+# ModelRequest and ModelResponse are never subclassed, so both filters below
+# use an exact type check - enough here, and cheaper than isinstance()
+
+
 def user_message_filter(messages: list[ModelMessage]) -> list[ModelMessage]:
     """Filter history to only include user messages (ModelRequest).
 
@@ -28,7 +30,7 @@ def user_message_filter(messages: list[ModelMessage]) -> list[ModelMessage]:
     Returns:
         Only user messages from the conversation
     """
-    return [msg for msg in messages if isinstance(msg, ModelRequest)]
+    return [msg for msg in messages if type(msg) is ModelRequest]
 
 
 def model_message_filter(messages: list[ModelMessage]) -> list[ModelMessage]:
@@ -43,20 +45,17 @@ def model_message_filter(messages: list[ModelMessage]) -> list[ModelMessage]:
     Returns:
         Only model responses from the conversation
     """
-    return [msg for msg in messages if isinstance(msg, ModelResponse)]
+    return [msg for msg in messages if type(msg) is ModelResponse]
 
 
 def main() -> None:
     """Run history filtering example."""
     # Load conversation history from previous example
     log.info("=== Loading Persisted History ===")
-    save_path = "./output_3.json"
-    with open(save_path, "rb") as f:
-        conv = json.load(f)
+    # The JSON bytes are validated straight into messages (see _history_store.py)
+    history = load_history("./output_3.json")
     log.info("Historical conversation loaded")
 
-    history = ModelMessagesTypeAdapter.validate_python(conv)
-
     # Example 1: Summarize only user messages
     log.info("\n=== Filtering: User Messages Only ===")
     agent_user = Agent("openai:gpt-5.1", history_processors=[user_message_filter])
@@ -2,6 +2,7 @@
 
 Demonstrates simple history truncation strategies:
 - Keep only the last N messages
+- Trim in chunks to keep the history prefix stable for prompt caching
 - Basic approach for preventing history bloat
 - Useful for simple use cases with small context windows
 - Trade-off: May lose important context
@@ -12,12 +13,12 @@ into our LLM calls. This is shown in the example 5c.
 This example shows a straightforward fixed-window approach.
 """
 
-import json
+from functools import partial
 
+from _history_store import load_history
+from _logging import log
 from dotenv import load_dotenv
-from loguru import logger as log
 from pydantic_ai import Agent, ModelMessage
-from pydantic_ai.messages import ModelMessagesTypeAdapter
 
 load_dotenv()
 
@@ -37,16 +38,39 @@ def keep_last_messages(messages: list[ModelMessage], num_messages: int = 3) -> l
     return output
 
 
+def keep_last_messages_chunked(messages: list[ModelMessage], upper: int = 30, lower: int = 20) -> list[ModelMessage]:
+    """Trim history in chunks, so the kept prefix stays the same for several turns.
+
+    `keep_last_messages()` moves the start of the history by one message every
+    turn, so the beginning of each request differs from the previous one and the
+    provider's prompt cache (e.g. OpenAI automatic prompt caching) can't reuse it.
+    Here the cut point only moves in steps of `upper - lower` messages: between
+    steps the request starts with the same messages and only grows at the end.
+
+    Args:
+        messages: Full conversation history
+        upper: Maximum number of messages to retain
+        lower: Number of messages retained right after a cut
+
+    Returns:
+        More than lower and at most upper last messages, or all if there are at most upper
+    """
+    if len(messages) <= upper:
+        return messages
+
+    # Cut points are multiples of `step`, using the first one that leaves at most `upper` messages
+    step = upper - lower
+    start = -(-(len(messages) - upper) // step) * step
+    log.info(f"Keeping messages from #{start + 1} on ({len(messages) - start} of {len(messages)})")
+    return messages[start:]
+
+
 def main() -> None:
     """Run fixed message count history example."""
     # Load conversation history from previous example
     log.info("=== Loading Persisted History ===")
-    save_path = "./output_3.json"
-    with open(save_path, "rb") as f:
-        conv = json.load(f)
+    history = load_history("./output_3.json")
     log.info("Historical conversation loaded")
-
-    history = ModelMessagesTypeAdapter.validate_python(conv)
     log.info(f"Total messages in history: {len(history)}")
 
     # Create agent with message count limiter
@@ -55,6 +79,12 @@ def main() -> None:
     result_1 = agent_1.run_sync("What were we talking about?", message_history=history)
     log.info(f"Answer (with truncated history):\n{result_1.output}")
 
+    # Create agent with chunked limiter (prompt-cache friendly)
+    log.info("\n=== Agent with Chunked Message Limit (4-6) ===")
+    agent_2 = Agent("openai:gpt-5.1", history_processors=[partial(keep_last_messages_chunked, upper=6, lower=4)])
+    result_2 = agent_2.run_sync("What were we talking about?", message_history=history)
+    log.info(f"Answer (with chunked history):\n{result_2.output}")
+
 
 if __name__ == "__main__":
     main()
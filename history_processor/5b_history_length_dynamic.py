@@ -9,21 +9,33 @@ Demonstrates advanced, production-ready history management:
 This example shows professional patterns for managing context windows.
 """
 
-import json
+import os
 from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
 
 import tiktoken
+from _history_store import load_history
+from _logging import log
 from dotenv import load_dotenv
-from loguru import logger as log
 from pydantic_ai import Agent, ModelMessage, RunContext
-from pydantic_ai.messages import ModelMessagesTypeAdapter
 
 load_dotenv()
 
+
 # `tiktoken` is used for OpenAI models, therefore if you're going to
 # use different model provided, this bit will need to be changed
 # to different tokenizer that corresponding to model used
-tokenizer = tiktoken.encoding_for_model("gpt-5.1")
+@cache
+def get_tokenizer(model: str = "gpt-5.1") -> tiktoken.Encoding:
+    """Return the tiktoken encoding for a model, loading it only on first use.
+
+    The BPE vocabulary is downloaded on first use and cached on disk. By default
+    tiktoken keeps it in the system temp directory, which may be cleared between
+    runs, so a persistent cache directory is used unless TIKTOKEN_CACHE_DIR is set.
+    """
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(Path.home() / ".cache" / "tiktoken"))
+    return tiktoken.encoding_for_model(model)
 
 
 @dataclass
@@ -36,8 +48,13 @@ class MemoryState:
 def estimate_tokens(messages: list[ModelMessage]) -> int:
     """Estimate token count in messages using the configured tokenizer.
 
-    Uses the global `tokenizer` (tiktoken for the configured model) to
-    encode each message part and counts the resulting tokens.
+    Encodes message parts with `get_tokenizer()` (tiktoken for the configured
+    model) and counts the resulting tokens. All texts are encoded together in
+    one `encode_ordinary_batch` call, which tiktoken spreads over several threads.
+    Only the messages of the latest turn are passed in (see `main()`), so no text
+    is encoded twice.
+    Special tokens are irrelevant for budgeting, so the ordinary variant skips
+    scanning for them (and never raises on text that contains one).
 
     Args:
         messages: List of messages to estimate tokens for
@@ -45,12 +62,9 @@ def estimate_tokens(messages: list[ModelMessage]) -> int:
     Returns:
         Estimated token count based on tokenizer output
     """
-    count = 0
-    for message in messages:
-        for msg in message.parts:
-            count += len(tokenizer.encode(str(msg.content)))
-
-    return count
+    texts = [str(msg.content) for message in messages for msg in message.parts]
+    encoded = get_tokenizer().encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)
+    return sum(map(len, encoded))
 
 
 # `context_guard()` below is an exemplary filter that allows to trim the
@@ -88,13 +102,9 @@ def main() -> None:
     """Run dynamic token-based history example."""
     # Load conversation history from previous example
     log.info("=== Loading Persisted History ===")
-    save_path = "./output_3.json"
-    with open(save_path, "rb") as f:
-        conv = json.load(f)
+    load_history("./output_3.json")
     log.info("Historical conversation loaded")
 
-    ModelMessagesTypeAdapter.validate_python(conv)
-
     # Create state and agent with token-aware processor
     state = MemoryState()
 
@@ -106,11 +116,15 @@ def main() -> None:
         system_prompt="You are a helpful and concise assistant.",
     )
 
+    # Token usage is tracked incrementally: after each turn only the messages
+    # produced by that turn (`new_messages()`) are counted and added to the total,
+    # instead of re-counting the whole history every time
+
     # First turn
     log.info("\n=== Turn 1 ===")
     result_2a = agent_2.run_sync("Tell me who you are", deps=state)
     log.info(f"Answer: {result_2a.output}")
-    state.token_count += estimate_tokens(result_2a.all_messages())
+    state.token_count += estimate_tokens(result_2a.new_messages())
     log.info(f"Tokens after turn 1: {state.token_count}")
 
     # Second turn
@@ -121,7 +135,7 @@ def main() -> None:
         deps=state,
     )
     log.info(f"Answer: {result_2b.output}")
-    state.token_count += estimate_tokens(result_2b.all_messages())
+    state.token_count += estimate_tokens(result_2b.new_messages())
     log.info(f"Tokens after turn 2: {state.token_count}")
 
     # Third turn
@@ -4,6 +4,7 @@ Demonstrates history-processing strategies that preserve tool-call / tool-respon
 
 - `keep_last_messages`: simple N-message truncation
 - `keep_last_messages_with_tools`: truncation that attempts to keep tool call/response pairs
+- `lossless_trim`: keeps every message but elides tool outputs and binary content of older turns
 
 This example attaches a simple tool to an `Agent` and demonstrates multi-turns
 with message history. It highlights pitfalls when history slicing breaks
@@ -13,16 +14,28 @@ Usage:
     uv run python 5c_history_with_tools.py
 """
 
+import random
 import secrets
 from collections.abc import Callable
+from dataclasses import replace
 
+from _logging import log
 from dotenv import load_dotenv
 from icecream import ic
-from loguru import logger as log
-from pydantic_ai import Agent, ModelMessage, ModelRequest, RunContext, ToolReturnPart
+from pydantic_ai import Agent, BinaryContent, ModelMessage, ModelRequest, RunContext, ToolReturnPart, UserPromptPart
+from pydantic_ai.messages import ModelRequestPart
 
 load_dotenv()
 
+# Die faces and the generator used by the `throw_dice` tool, created once instead of on every roll.
+# The generator is seeded from the OS entropy source once, so rolls don't need a syscall each.
+DICE_FACES = (1, 2, 3, 4, 5, 6)
+dice_rng = random.Random(secrets.randbits(64))  # noqa: S311 - dice rolls, not cryptography
+
+# `lossless_trim` only elides content longer than this - replacing a short tool
+# result (like a single dice roll) with a placeholder would make the context bigger
+ELIDE_MIN_CHARS = 200
+
 
 def keep_last_messages(messages: list[ModelMessage], num_messages: int = 3) -> list[ModelMessage]:
     """Keep only the last N messages from history.
@@ -73,18 +86,71 @@ def keep_last_messages_with_tools(messages: list[ModelMessage], num_messages: in
     return messages[max(-len(messages), start_index) :]
 
 
-def run_conversation_with_history_processor(history_processor: Callable[..., list[ModelMessage]]) -> None:
-    processor_name = getattr(history_processor, "__name__", "unknown_processor")
+def lossless_trim(messages: list[ModelMessage], keep_last_turns: int = 1) -> list[ModelMessage]:
+    """Shrink older turns without dropping any message.
+
+    User prompts and model answers are kept verbatim; only bulky mechanical content
+    of turns older than the last `keep_last_turns` is replaced by short placeholders:
+    tool outputs and binary attachments (e.g. images) in user prompts. Only content
+    longer than ELIDE_MIN_CHARS (and than its placeholder) is replaced. The message
+    structure stays intact, so tool-call/response pairs are never split.
+
+    Args:
+        messages: Full conversation history with tool calls
+        keep_last_turns: Number of most recent turns (starting with a user prompt) left untouched
+
+    Returns:
+        Conversation with the same messages, older tool outputs and attachments elided
+    """
+    turn_starts = [
+        idx
+        for idx, msg in enumerate(messages)
+        if isinstance(msg, ModelRequest) and any(isinstance(part, UserPromptPart) for part in msg.parts)
+    ]
+    if len(turn_starts) <= keep_last_turns:
+        return messages
+
+    cutoff = turn_starts[-keep_last_turns] if keep_last_turns else len(messages)
+    log.info(f"Eliding tool outputs and attachments in the first {cutoff} of {len(messages)} messages")
+
+    def worth_eliding(placeholder: str, size: int) -> bool:
+        return size > max(ELIDE_MIN_CHARS, len(placeholder))
+
+    def elide_attachment(item: BinaryContent) -> BinaryContent | str:
+        placeholder = f"[{item.media_type} attachment elided, {len(item.data)} bytes]"
+        return placeholder if worth_eliding(placeholder, len(item.data)) else item
+
+    def elide(part: ModelRequestPart) -> ModelRequestPart:
+        if isinstance(part, ToolReturnPart):
+            size = len(str(part.content))
+            placeholder = f"[tool {part.tool_name} output elided, {size} chars]"
+            return replace(part, content=placeholder) if worth_eliding(placeholder, size) else part
+        if isinstance(part, UserPromptPart) and not isinstance(part.content, str):
+            content = [elide_attachment(item) if isinstance(item, BinaryContent) else item for item in part.content]
+            return replace(part, content=content)
+        return part
+
+    # Messages are copied with replaced parts, the caller's history is left unchanged
+    trimmed = [
+        replace(msg, parts=[elide(part) for part in msg.parts]) if isinstance(msg, ModelRequest) else msg for msg in messages[:cutoff]
+    ]
+    return trimmed + messages[cutoff:]
+
+
+def run_conversation_with_history_processor(*history_processors: Callable[..., list[ModelMessage]]) -> None:
+    processor_name = " -> ".join(getattr(processor, "__name__", "unknown_processor") for processor in history_processors)
     log.info(f"\n=== Running with history processor: {processor_name} ===")
 
-    # Create agent with history processor
-    agent = Agent("openai:gpt-5.1", system_prompt="You are a helpful and playful assistant", history_processors=[history_processor])
+    # Create agent with history processors (applied in the given order)
+    agent = Agent(
+        "openai:gpt-5.1", system_prompt="You are a helpful and playful assistant", history_processors=list(history_processors)
+    )
 
     # Add basic tool
     @agent.tool
     async def throw_dice(ctx: RunContext[None]) -> int:
         "Roll a die and return a random number between 1 and 6"
-        return secrets.choice([1, 2, 3, 4, 5, 6])
+        return dice_rng.choice(DICE_FACES)
 
     try:
         result_1 = agent.run_sync("Please provide a random number")
@@ -94,11 +160,14 @@ def run_conversation_with_history_processor(history_processor: Callable[..., lis
         ic(result_2.output)
 
         # Display full conversation history
-        log.info(f"\nTotal messages in history: {len(result_2.all_messages())}")
-        for idx, msg in enumerate(result_2.all_messages(), start=1):
+        history = result_2.all_messages()
+        lines = [f"\nTotal messages in history: {len(history)}"]
+        for idx, msg in enumerate(history, start=1):
             # Extract readable message content; parts may vary in type
             content = getattr(msg.parts[0], "content", str(msg.parts)) if msg.parts else "(no content)"
-            log.info(f"Message #{idx}: {content}")
+            lines.append(f"Message #{idx}: {content}")
+        # One log call for the whole history instead of one per message
+        log.info("\n".join(lines))
 
     except Exception as e:
         log.error(f"Agent failed: {e}")
@@ -119,6 +188,9 @@ def main() -> None:
     log.info("Run tool optimized trimming method with tool calls")
     run_conversation_with_history_processor(keep_last_messages_with_tools)
 
+    log.info("Run lossless trimming of older tool outputs before tool optimized trimming")
+    run_conversation_with_history_processor(lossless_trim, keep_last_messages_with_tools)
+
 
 if __name__ == "__main__":
     main()
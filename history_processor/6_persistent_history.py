@@ -2,6 +2,7 @@
 
 Demonstrates production-ready conversation persistence:
 - Save conversation history to SQLite database
+- Persist records in the background while the conversation continues
 - Store prompts, responses, and metadata
 - Retrieve and query historical conversations
 - Track token usage and model information
@@ -10,22 +11,75 @@ Demonstrates production-ready conversation persistence:
 This example shows how to build durable conversation storage systems.
 """
 
+import asyncio
+import zlib
+
+from _logging import log
 from dotenv import load_dotenv
 from icecream import ic
-from loguru import logger as log
 from pydantic_ai import Agent, AgentRunResult
-from sqlalchemy import Text, create_engine
-from sqlalchemy.orm import Mapped, declarative_base, mapped_column, sessionmaker
+from pydantic_core import to_jsonable_python
+from sqlalchemy import LargeBinary, Text, TypeDecorator, event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Mapped, declarative_base, mapped_column
 from sqlalchemy.types import JSON
 
 load_dotenv()
 
 
 # --- Database Setup ---
-engine = create_engine("sqlite:///mydb.db")
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# aiosqlite runs SQLite calls in its own thread, so commits don't block the event loop
+engine = create_async_engine("sqlite+aiosqlite:///mydb.db")
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def set_sqlite_pragma(dbapi_connection, connection_record) -> None:
+    """Tune every new SQLite connection for an append-heavy archive.
+
+    WAL lets reads run alongside writes and, with synchronous=NORMAL, syncs to disk
+    at checkpoints instead of on every commit; cache_size is in KiB when negative (64 MiB).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
+# Sessions are short-lived (one per operation); expire_on_commit=False keeps
+# the loaded attributes of returned records readable after the session closes
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
-db = SessionLocal()
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored as bytes, zlib-compressed when longer than `threshold` bytes.
+
+    LLM answers are verbose and compress well, so the database stays smaller and
+    reads touch fewer pages. The first byte marks how the value was stored
+    (b"z" compressed, b"r" raw), so short values skip compression entirely.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+    threshold = 512
+
+    def process_bind_param(self, value: str | None, dialect) -> bytes | None:
+        if value is None:
+            return None
+        data = value.encode()
+        if len(data) > self.threshold:
+            return b"z" + zlib.compress(data)
+        return b"r" + data
+
+    def process_result_value(self, value: bytes | str | None, dialect) -> str | None:
+        # Values written before the column was compressed come back as plain text
+        if value is None or isinstance(value, str):
+            return value
+        marker, payload = value[:1], value[1:]
+        if marker == b"z":
+            payload = zlib.decompress(payload)
+        return payload.decode()
 
 
 class ConversationRecord(Base):
@@ -34,7 +88,7 @@ class ConversationRecord(Base):
     Attributes:
         id: Unique identifier for the record
         question: User prompt/question
-        answer: Agent response
+        answer: Agent response (compressed when long, see CompressedText)
         model_used: Model identifier (e.g., "gpt-5.1")
         usage: Token usage metadata (input, output, total tokens)
     """
@@ -42,14 +96,11 @@ class ConversationRecord(Base):
     __tablename__ = "conversations"
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     question: Mapped[str] = mapped_column(Text, default="")
-    answer: Mapped[str] = mapped_column(Text, default="")
-    model_used: Mapped[str] = mapped_column(Text, default="")
+    answer: Mapped[str] = mapped_column(CompressedText, default="")
+    model_used: Mapped[str] = mapped_column(Text, default="", index=True)
     usage: Mapped[JSON] = mapped_column(JSON, default={})
 
 
-Base.metadata.create_all(bind=engine)
-
-
 def prepare_data_for_db(prompt: str, result: AgentRunResult) -> ConversationRecord:
     """Convert agent result to database record.
 
@@ -63,7 +114,8 @@ def prepare_data_for_db(prompt: str, result: AgentRunResult) -> ConversationReco
     messages = result.all_messages() or []
     last_message = messages[-1] if messages else None
     model_used = getattr(last_message, "model_name", "") if last_message is not None else ""
-    usage_data = result.usage().__dict__
+    # RunUsage is a dataclass; convert it to a plain JSON-compatible dict once here
+    usage_data = to_jsonable_python(result.usage())
 
     return ConversationRecord(
         question=prompt,
@@ -73,28 +125,83 @@ def prepare_data_for_db(prompt: str, result: AgentRunResult) -> ConversationReco
     )
 
 
-def add_message_to_db(record: ConversationRecord) -> None:
-    """Persist conversation record to database.
+async def create_tables() -> None:
+    """Create database tables if they don't exist yet."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def add_many(records: list[ConversationRecord]) -> None:
+    """Persist several conversation records in a single transaction.
 
     Args:
-        record: ConversationRecord to save
+        records: ConversationRecords to save
     """
-    db.add(record)
-    db.commit()
-    log.info(f"Conversation saved to database with ID: {record.id}")
+    async with SessionLocal() as session:
+        session.add_all(records)
+        await session.commit()
+    log.info(f"{len(records)} conversations saved to database with IDs: {[record.id for record in records]}")
+
+
+class ConversationWriter:
+    """Background writer persisting records queued by the conversation loop.
+
+    `submit()` returns immediately, so the next agent call doesn't wait for the
+    commit. Records that pile up while a commit is running are written together
+    in the next transaction (up to `batch_size`).
+
+    Usage:
+        writer = ConversationWriter()
+        writer.start()
+        writer.submit(record)
+        await writer.close()  # waits until everything is saved
+    """
+
+    def __init__(self, batch_size: int = 50) -> None:
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue[ConversationRecord | None] = asyncio.Queue()
+        self.task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    def submit(self, record: ConversationRecord) -> None:
+        self.queue.put_nowait(record)
 
+    async def run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
 
-def get_all_conversations() -> list[ConversationRecord]:
+            records = [record for record in batch if record is not None]
+            if records:
+                try:
+                    await add_many(records)
+                except Exception as e:
+                    log.error(f"Failed to save {len(records)} conversations: {e}")
+            if None in batch:
+                return
+
+    async def close(self) -> None:
+        """Save everything queued so far and stop the writer."""
+        self.queue.put_nowait(None)
+        if self.task is not None:
+            await self.task
+
+
+async def get_all_conversations() -> list[ConversationRecord]:
     """Retrieve all conversations from database.
 
     Returns:
         List of all conversation records
     """
-    conversations = db.query(ConversationRecord).all()
+    async with SessionLocal() as session:
+        conversations = list(await session.scalars(select(ConversationRecord)))
     return conversations
 
 
-def get_conversation_by_id(record_id: int) -> ConversationRecord | None:
+async def get_conversation_by_id(record_id: int) -> ConversationRecord | None:
     """Retrieve specific conversation by ID.
 
     Args:
@@ -103,35 +210,57 @@ def get_conversation_by_id(record_id: int) -> ConversationRecord | None:
     Returns:
         ConversationRecord if found, None otherwise
     """
-    return db.query(ConversationRecord).filter(ConversationRecord.id == record_id).first()
+    async with SessionLocal() as session:
+        return await session.get(ConversationRecord, record_id)
 
 
-def main() -> None:
+async def main() -> None:
     """Run database persistence example."""
+    await create_tables()
+
     # Initialize agent
     log.info("=== Initializing Agent ===")
     agent = Agent("openai:gpt-5.1", system_prompt=("You are a helpful assistant. Respond concisely and clearly."))
 
-    # Run conversation and save to database
-    log.info("\n=== Running Conversation ===")
-    prompt = "What are the three key benefits of learning Python?"
-    result = agent.run_sync(user_prompt=prompt)
-    log.info(f"Prompt: {prompt}")
-    log.info(f"Answer: {result.output}")
+    # Start the background writer
+    writer = ConversationWriter()
+    writer.start()
 
-    # Save to database
+    # Run conversation and save to database
+    # Each record is queued for the writer, so the next prompt is already sent
+    # while the previous answer is being committed
+    prompts = [
+        "What are the three key benefits of learning Python?",
+        "What are the three most common pitfalls when learning Python?",
+    ]
+    for prompt in prompts:
+        log.info("\n=== Running Conversation ===")
+        result = await agent.run(user_prompt=prompt)
+        log.info(f"Prompt: {prompt}")
+        log.info(f"Answer: {result.output}")
+
+        writer.submit(prepare_data_for_db(prompt, result))
+
+    # Wait until all records are saved
     log.info("\n=== Saving to Database ===")
-    record = prepare_data_for_db(prompt, result)
-    add_message_to_db(record)
+    await writer.close()
 
     # Retrieve and display all conversations
     log.info("\n=== All Conversations in Database ===")
-    conversations = get_all_conversations()
+    conversations = await get_all_conversations()
     log.info(f"Total conversations: {len(conversations)}")
 
     for conv in conversations:
         ic(conv.__dict__)
 
+    await engine.dispose()
+
 
 if __name__ == "__main__":
-    main()
+    try:
+        # uvloop is a faster drop-in event loop; it isn't available on Windows
+        from uvloop import new_event_loop
+    except ImportError:
+        new_event_loop = None
+
+    asyncio.run(main(), loop_factory=new_event_loop)
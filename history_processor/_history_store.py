@@ -0,0 +1,25 @@
+"""Loading of the conversation persisted by example 3.
+
+Examples 4, 5a and 5b all start from `output_3.json`. The raw bytes are
+validated straight into `ModelMessage` objects by pydantic-core, without
+decoding them to a `str` or building intermediate dicts first.
+
+Usage:
+    from _history_store import load_history
+"""
+
+from pathlib import Path
+
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
+
+
+def load_history(path: str | Path = "./output_3.json") -> list[ModelMessage]:
+    """Load persisted conversation history.
+
+    Args:
+        path: Path to the JSON file written by example 3
+
+    Returns:
+        Validated conversation history
+    """
+    return ModelMessagesTypeAdapter.validate_json(Path(path).read_bytes())
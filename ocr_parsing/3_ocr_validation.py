@@ -25,12 +25,14 @@ class ModelAnalysisOutput(BaseModel):
 # Sometimes LLMs don't follow the schema perfectly. Here's what happens if
 # the LLM sends a string instead of a list for file_elements.
 # Pydantic will automatically detect and reject this invalid data.
+# LLM responses arrive as raw JSON text, so the example data is raw JSON as well.
 
-bad_llm_data = {
+# ❌ WRONG: "file_elements" holds a string instead of a FileElement object
+bad_llm_response = b"""{
     "file_type": "invoice",
     "file_content_md": "# Invoice Content",
-    "file_elements": ["No elements found"],  # ❌ WRONG: String instead of FileElement object
-}
+    "file_elements": ["No elements found"]
+}"""
 
 
 # ==============================================================================
@@ -44,13 +46,16 @@ bad_llm_data = {
 def demonstrate_validation_error():
     try:
         log.info("Attempting to validate LLM response...")
-        # This is what happens under the hood when agent_structured.run() receives data
+        # This is what happens under the hood when agent_structured.run() receives data.
+        # model_validate_json parses and validates the raw bytes in one pass in
+        # pydantic-core, without building an intermediate dict first - prefer it
+        # over json.loads() + ModelAnalysisOutput(**data) whenever you get JSON text.
 
         ### REMARK ###
         # Line below has to be uncommented to trigger the `ValidationError`
         # we're looking and waiting for. This shows how Pydantic validates
         # the LLM's response against your schema.
-        # _ = ModelAnalysisOutput(**bad_llm_data) # <-- uncomment this line
+        # _ = ModelAnalysisOutput.model_validate_json(bad_llm_response) # <-- uncomment this line
         ### REMARK ###
 
     except ValidationError as e:
@@ -0,0 +1,872 @@
+"""Shared building blocks of the OCR examples.
+
+Pydantic models describing the OCR results and the utilities used by both
+`1_basic_ocr_demo.py` and `2_ocr_with_structured_output.py`: listing input
+files, rendering PDF pages to images, running the inference and saving results.
+The OpenAI model and its connection pool are shared here too; agents, their
+settings and prompts stay in the example scripts.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import os
+import random
+import threading
+import time
+from collections.abc import AsyncIterable, AsyncIterator
+from functools import cache
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+from loguru import logger as log
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+from pydantic.dataclasses import dataclass as pydantic_dataclass
+from pydantic_ai import Agent, BinaryContent
+from pydantic_ai.exceptions import ModelAPIError, ModelHTTPError
+from pydantic_ai.models import Model
+from pydantic_ai.models.openai import OpenAIChatModel
+from pydantic_ai.providers.openai import OpenAIProvider
+from pydantic_core import to_json
+
+# OPENAI_API_KEY may come from the .env file - it has to be loaded before the model is created
+load_dotenv()
+
+# ==============================================================================
+# CONCURRENCY CONTROL
+# ==============================================================================
+# Three limits work together here:
+# - `rate_limiter` caps how many requests are *started* per minute, matching the
+#   requests-per-minute quota of your API tier (500 RPM is OpenAI's tier 1 limit
+#   for most models - raise it if your tier allows more).
+# - `token_limiter` caps how many tokens the started requests use per minute, the
+#   second quota of every API tier. Token usage isn't known before the response,
+#   so each page is charged an estimate (see `estimate_request_tokens`).
+# - `admission` caps how many requests are *in flight* at once. With the two rate
+#   limiters preventing bursts, 32 keeps plenty of pages processing in parallel.
+#   Set the OCR_MAX_CONCURRENT environment variable to change it without editing
+#   the code, or call `admission.set_limit()` to resize it while pages are running.
+# If you still hit rate limits (HTTP 429), the API has a transient failure (5xx) or the
+# connection fails or times out, `run_agent_with_retries` waits for the time the API asks for
+# (Retry-After header) - or a random, exponentially growing backoff - and tries again,
+# up to MAX_RETRIES times.
+# A page that still fails is saved as FAILED_PAGE_RESULT instead of failing the run.
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 500_000
+MAX_CONCURRENT_REQUESTS = int(os.getenv("OCR_MAX_CONCURRENT", "32"))
+MAX_RETRIES = 5
+MAX_BACKOFF_SECONDS = 30
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+FAILED_PAGE_RESULT = "<<failed>>"
+
+# Input tokens of a single page image: a 1600px page is billed as 6 tiles of 512px
+# (170 tokens each) plus 85 base tokens in OpenAI's high detail mode
+IMAGE_TOKENS_PER_PAGE = 1105
+# Room left for the answer - a full page of Markdown (or the structured output)
+OUTPUT_TOKENS_PER_PAGE = 1500
+
+# ==============================================================================
+# PAGE BATCHING
+# ==============================================================================
+# By default every page is sent in its own request. Setting the OCR_BATCH_PAGES
+# environment variable (e.g. to 4) sends that many consecutive pages in one request
+# instead: the prompt is sent - and billed - once per request rather than once per
+# page, and there are fewer round trips. The model then returns a list with one
+# output per page; if it returns a different number of outputs, the pages of that
+# request are analyzed one by one instead. Every page is still cached on its own.
+# A batch takes longer to answer than a single page, so keep it small.
+BATCH_PAGES = int(os.getenv("OCR_BATCH_PAGES", "1"))
+BATCH_INSTRUCTIONS = (
+    " The {count} images are consecutive pages of the document. Analyze every page separately"
+    " and return exactly one result per page, in the same order as the images."
+)
+
+
+class RateLimiter:
+    """Async token bucket allowing at most `max_rate` acquisitions per `period` seconds.
+
+    The bucket starts full, so short bursts up to `max_rate` go through at once;
+    after that requests are spread evenly over time.
+
+    Usage:
+        async with rate_limiter:
+            ...
+
+        await token_limiter.acquire(estimated_tokens)
+    """
+
+    def __init__(self, max_rate: float, period: float = 60.0) -> None:
+        self.max_rate = max_rate
+        self.refill_per_second = max_rate / period
+        self.tokens = max_rate
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until `amount` can be taken from the bucket, then take it.
+
+        Args:
+            amount (float): how much of the per-period budget to use
+        """
+        # More than a full bucket could never be granted - take a full bucket instead
+        amount = min(amount, self.max_rate)
+        # The lock makes waiting requests take their turn in order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.max_rate, self.tokens + (now - self.updated_at) * self.refill_per_second)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.refill_per_second)
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
+
+class Admission:
+    """Async admission controller letting at most `limit` requests run at once.
+
+    Works like `asyncio.Semaphore`, but the limit is an explicit counter guarded by
+    an `asyncio.Condition`, so it can be changed safely while requests are running.
+    After lowering the limit, requests already running finish normally and new ones
+    wait until the number of running requests drops below the new limit.
+
+    Usage:
+        async with admission:
+            ...
+
+        await admission.set_limit(8)
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        """Wait until a request may start and count it as running."""
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def release(self) -> None:
+        """Count a request as finished and let the next waiting one start."""
+        async with self.condition:
+            self.active -= 1
+            self.condition.notify(1)
+
+    async def set_limit(self, limit: int) -> None:
+        """Change how many requests may run at once.
+
+        Args:
+            limit (int): new maximum number of requests in flight
+        """
+        async with self.condition:
+            self.limit = limit
+            # A raised limit may let several waiting requests start at once
+            self.condition.notify_all()
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        # Shielded, so a request cancelled on its way out still frees its slot
+        await asyncio.shield(self.release())
+
+
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, 60.0)
+token_limiter = RateLimiter(TOKENS_PER_MINUTE, 60.0)
+admission = Admission(MAX_CONCURRENT_REQUESTS)
+
+# Number of pdftoppm processes rendering pages at the same time (across all PDFs).
+# One CPU is left free for the event loop and in-flight requests.
+render_semaphore = asyncio.Semaphore(max(1, (os.cpu_count() or 2) - 1))
+
+# Number of PDFs processed at the same time. Pages of an open PDF are rendered
+# eagerly and kept in memory until analyzed, so this bounds memory use on large
+# corpora while still keeping enough pages queued to fill `admission`.
+pdf_semaphore = asyncio.Semaphore(int(os.getenv("PDF_RENDER_CONCURRENCY", "4")))
+
+# ==============================================================================
+# PAGE IMAGES
+# ==============================================================================
+# Pages are rendered by poppler's `pdftoppm` directly in the format sent to the LLM,
+# so they're never re-encoded in Python. JPEG is the default: it's the smallest for
+# scans and pages with photos. Clean digital text pages in grayscale are often
+# smaller as lossless PNG, which also keeps letter edges free of compression
+# artifacts - set the OCR_IMAGE_FORMAT environment variable to "png" to use it.
+# Every format maps to its pdftoppm options, media type and file extension.
+IMAGE_FORMATS = {
+    # Quality 80 keeps text sharp while making pages noticeably smaller to upload;
+    # progressive encoding shaves off a few more percent
+    "jpeg": (["-jpeg", "-jpegopt", "quality=80,progressive=y,optimize=y"], "image/jpeg", "jpg"),
+    "png": (["-png"], "image/png", "png"),
+}
+IMAGE_FORMAT = os.getenv("OCR_IMAGE_FORMAT", "jpeg").lower()
+if IMAGE_FORMAT not in IMAGE_FORMATS:
+    raise ValueError(f"Unsupported OCR_IMAGE_FORMAT {IMAGE_FORMAT!r}, use one of: {', '.join(IMAGE_FORMATS)}")
+RENDER_OPTIONS, IMAGE_MEDIA_TYPE, IMAGE_EXTENSION = IMAGE_FORMATS[IMAGE_FORMAT]
+
+# ==============================================================================
+# HTTP CLIENT AND MODEL
+# ==============================================================================
+# One connection pool shared by all OCR requests (pass it to the model's provider).
+# HTTP/2 multiplexes the concurrent requests over a few connections instead of
+# opening - and TLS-handshaking - a new connection for every request in flight.
+# `admission` starts with MAX_CONCURRENT_REQUESTS requests in flight, so the pool
+# doesn't need more connections than that (HTTP/2 can multiplex even more requests).
+http_client = httpx.AsyncClient(
+    http2=True,
+    # Same timeouts as pydantic-ai's default client - a page analysis can take minutes
+    timeout=httpx.Timeout(600, connect=5),
+    limits=httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS, max_keepalive_connections=MAX_CONCURRENT_REQUESTS),
+)
+
+# The model all OCR agents run on, created once and using the shared connection pool.
+# Settings that differ between the examples (e.g. the prompt cache key) are passed
+# to each agent as `model_settings` instead of creating another model.
+model = OpenAIChatModel("gpt-5.1", provider=OpenAIProvider(http_client=http_client))
+
+# ==============================================================================
+# RESULT CACHE
+# ==============================================================================
+# Every analyzed page is stored in CACHE_DIR as `<key>.json`, where the key is a
+# hash of the agent (model, system prompt, instructions and settings), the prompt,
+# the JSON schema of the expected output and the image bytes. Re-running an example on the same PDFs then skips the LLM calls
+# entirely. A cached result that no longer validates (e.g. written by an older
+# version of the output model) is deleted and the page is analyzed again.
+# Delete the directory to force a fresh analysis.
+CACHE_DIR = Path("./files/cache")
+
+
+# ==============================================================================
+# PYDANTIC MODELS - Define data structures and validation
+# ==============================================================================
+# These models serve two purposes:
+# 1. Define the expected JSON schema for the API response
+# 2. Provide automatic validation - Pydantic will reject invalid data from the LLM
+# Results are never modified after validation, so all models are frozen, and unknown
+# fields are rejected instead of being carried along (`extra="forbid"`).
+class Results(BaseModel):
+    """Wrapper for basic OCR results - just filename and text output"""
+
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    filename: str = ""
+    result: str = ""
+
+
+# A page can consist of hundreds of elements, so FileElement is a slotted pydantic
+# dataclass - no per-instance __dict__ - while still being validated like a model
+@pydantic_dataclass(slots=True, frozen=True, config=ConfigDict(extra="forbid"))
+class FileElement:
+    """Represents a single element detected on a document page.
+
+    Examples of elements:
+    - A table with columns and rows
+    - A paragraph of text
+    - An image or logo description
+    - A header or title
+    - A list or bullet points
+    """
+
+    element_type: str = Field(description="Type of the element found on the page", default="")
+    element_content: str = Field(description="Content of the element found on the page", default="")
+
+
+class ModelAnalysisOutput(BaseModel):
+    """Structured output from the LLM for document analysis.
+
+    This is the schema that tells the LLM exactly what we want back.
+    PydanticAI uses this to enforce type checking on LLM responses.
+    """
+
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    file_type: str = Field(
+        description="Type name which can describe given file precisely, e.g.: invoice, internal_document, instruction, other",
+        default="",
+    )
+    file_content_md: str = Field(description="Output of the OCR process, contents of the file in Markdown", default="")
+    file_elements: list[FileElement] = Field(
+        description="Elements the given page consists from: tables, images, paragraphs, graphs, flowcharts etc.", default_factory=list
+    )
+
+
+class OCROutput(BaseModel):
+    """Final output combining the filename and structured analysis results."""
+
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    filename: str = ""
+    # Required - it always comes from the LLM, so there's no empty default to build
+    analysis_result: ModelAnalysisOutput
+
+
+# Serializer for the per-PDF list of page results, built once from the compiled schemas
+results_adapter = TypeAdapter(list[Results | OCROutput])
+
+
+@cache
+def get_output_adapter(output_type: object) -> TypeAdapter:
+    """Return the (cached) TypeAdapter used to store and load an agent's output in the page cache.
+
+    Building a TypeAdapter compiles a validator and serializer, so it's done once
+    per output type instead of once per analyzed page.
+
+    Args:
+        output_type (object): output type of the agent (e.g. str or ModelAnalysisOutput)
+
+    Returns:
+        TypeAdapter: adapter validating and dumping values of `output_type`
+    """
+    return TypeAdapter(output_type)
+
+
+@cache
+def get_output_schema(output_type: object) -> bytes:
+    """Return the (cached) JSON schema of an agent's output type, used in the page cache key.
+
+    Unlike `repr(output_type)`, the schema changes whenever a field, type or
+    description of the output model changes, so outdated results aren't reused.
+
+    Args:
+        output_type (object): output type of the agent (e.g. str or ModelAnalysisOutput)
+
+    Returns:
+        bytes: the JSON schema serialized to JSON
+    """
+    return to_json(get_output_adapter(output_type).json_schema())
+
+
+# ==============================================================================
+# UTILITY FUNCTIONS - Handle file operations and LLM inference
+# ==============================================================================
+# Set the OCR_DEBUG environment variable to 1 to log the model's output of every
+# page (useful for debugging, but very verbose for large documents)
+OCR_DEBUG = os.getenv("OCR_DEBUG") == "1"
+
+
+def list_all_files(directory: Path, extension: str = "pdf") -> list[Path]:
+    """Find all files with a specific extension in a directory.
+
+    Args:
+        directory (Path): directory to be checked
+        extension (str, optional): file extension of files to be listed, with or without the dot. Defaults to "pdf".
+
+    Returns:
+        list[Path]: a list of filepaths for further analysis
+    """
+    # Match the whole suffix, so "pdf" doesn't also pick up e.g. "notes.xpdf"
+    suffix = "." + extension.lower().lstrip(".")
+    # scandir reads the file type together with the names, so skipping
+    # subdirectories doesn't cost an extra stat() per entry
+    with os.scandir(directory) as entries:
+        return [Path(e.path) for e in entries if e.is_file() and e.name.lower().endswith(suffix)]
+
+
+async def render_page(file_path: Path, page_number: int, max_size: int | None, grayscale: bool) -> bytes:
+    """Render a single PDF page to an image (see IMAGE_FORMAT) with poppler's `pdftoppm`.
+
+    Args:
+        file_path (Path): path to the PDF file
+        page_number (int): number of the page to render (starting from 1)
+        max_size (int | None): length of the longer page edge in pixels (None keeps the render DPI)
+        grayscale (bool): render the page in grayscale instead of colour
+
+    Returns:
+        bytes: the rendered image
+    """
+    args = ["pdftoppm", *RENDER_OPTIONS, "-f", str(page_number), "-l", str(page_number)]
+    if max_size:
+        # Scales the longer edge, keeping the aspect ratio
+        args += ["-scale-to", str(max_size)]
+    if grayscale:
+        args.append("-gray")
+    # Without an output file name pdftoppm writes the image to stdout
+    args += ["-singlefile", str(file_path)]
+
+    async with render_semaphore:
+        process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            image_bytes, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            # Cancelling only stops waiting for the output - stop pdftoppm itself too
+            process.kill()
+            await process.wait()
+            raise
+    if process.returncode != 0:
+        raise RuntimeError(f"pdftoppm failed on page {page_number} of {file_path.name}: {stderr.decode().strip()}")
+    return image_bytes
+
+
+async def pdf_to_jpg(
+    file_path: Path, max_size: int | None = 1600, grayscale: bool = True, save_dir: Path | None = None
+) -> AsyncIterator[tuple[str, bytes]]:
+    """Convert PDF pages to individual images, yielding each page as soon as it is ready.
+
+    PDFs are converted to images because:
+    - LLMs process images better than PDF binary data
+    - Each page becomes a separate analysis task (better for scaling)
+    - JPG (or PNG, see IMAGE_FORMAT) is supported by every image API
+
+    Every page is rendered by its own `pdftoppm` process, which pipes the image
+    straight back - pages are never written to disk and read back again. All pages
+    start rendering at once, limited by `render_semaphore`, and are yielded in page
+    order - so the caller can send the first pages to the LLM while the rest of the
+    document is still being rendered.
+
+    By default pages are rendered in grayscale with the long edge scaled to
+    1600px. Text stays perfectly readable for OCR, while the upload is much
+    smaller and the image costs fewer input tokens than a full-colour render.
+
+    Args:
+        file_path (Path): path to a file to be inspected
+        max_size (int | None): length of the longer page edge in pixels (None keeps the render DPI)
+        grayscale (bool): render pages in grayscale instead of colour
+        save_dir (Path | None): if set, pages are also saved there as `<filename>_page_<idx>.jpg` (or `.png`)
+            (useful for checking what the LLM gets to see)
+
+    Yields:
+        tuple[str, bytes]: page name (`<filename>_page_<idx>`) and its image, in page order
+    """
+    # pdf2image pulls in Pillow, so it's only imported once a PDF is actually converted
+    from pdf2image import pdfinfo_from_path
+
+    filename = Path(file_path).stem
+    page_count = (await asyncio.to_thread(pdfinfo_from_path, file_path))["Pages"]
+    if save_dir:
+        save_dir.mkdir(parents=True, exist_ok=True)
+
+    renders = [asyncio.create_task(render_page(file_path, idx + 1, max_size, grayscale)) for idx in range(page_count)]
+    try:
+        for idx, render in enumerate(renders):
+            page_name = f"{filename}_page_{idx}"
+            image_bytes = await render
+            if save_dir:
+                await asyncio.to_thread(Path(save_dir, f"{page_name}.{IMAGE_EXTENSION}").write_bytes, image_bytes)
+            yield page_name, image_bytes
+    finally:
+        # Stop rendering the remaining pages if the caller stopped early or failed -
+        # cancelled renders kill their pdftoppm process (see render_page)
+        for render in renders:
+            render.cancel()
+
+
+async def run_inference(agent: Agent, prompt: str, pages: list[tuple[str, bytes]]) -> list[Results | OCROutput]:
+    """Execute LLM inference on one or more document images.
+
+    This is the core function that:
+    1. Returns the cached result of every page that was already analyzed
+    2. Sends the remaining images to the LLM with the prompt, in a single request
+    3. Handles any errors
+    4. Returns the results in the appropriate format
+
+    Args:
+        agent (Agent): an Agent or LLM model used to run the inference with
+        prompt (str): textual analysis instructions for the Agent/LLM model
+        pages (list[tuple[str, bytes]]): names of the analyzed pages (stored as the results'
+            filenames) and their images - a single page, or a batch (see BATCH_PAGES)
+
+    Returns:
+        list[Results | OCROutput]: Pydantic objects containing filename and analysis result data, in page order
+    """
+    output_adapter = get_output_adapter(agent.output_type)
+    results: list[Results | OCROutput | None] = [None] * len(pages)
+
+    # Same agent + same prompt + same output schema + same page => same answer, so look
+    # it up first. Everything about the agent that changes its answers - the model, the
+    # system prompt and the settings - is part of the key too
+    agent_id = get_agent_fingerprint(agent)
+    output_schema = get_output_schema(agent.output_type)
+    todo = []
+    for idx, (page_name, image_bytes) in enumerate(pages):
+        cache_key = page_cache_key(agent_id, prompt, output_schema, image_bytes)
+        cache_path = CACHE_DIR / f"{cache_key}.json"
+        cached_output = await asyncio.to_thread(load_cached_output, cache_path, output_adapter)
+        if cached_output is not None:
+            log.info(f"File loaded from cache: {page_name}")
+            results[idx] = wrap_output(page_name, cached_output)
+        else:
+            todo.append((idx, page_name, image_bytes, cache_path))
+    if not todo:
+        return results
+
+    # A single page is answered with the agent's own output type,
+    # a batch with a list holding one such output per page
+    page_names = ", ".join(page_name for _, page_name, _, _ in todo)
+    if len(todo) == 1:
+        request_prompt, output_type = prompt, agent.output_type
+    else:
+        request_prompt, output_type = prompt + BATCH_INSTRUCTIONS.format(count=len(todo)), list[agent.output_type]
+
+    # BinaryContent wraps the image bytes with proper media type.
+    # This tells PydanticAI that we're sending an image, not text.
+    # The prompt goes first: providers cache the longest common prefix of requests,
+    # so the part that is the same for every page must come before the images.
+    message_parts = [request_prompt, *(BinaryContent(data=image_bytes, media_type=IMAGE_MEDIA_TYPE) for _, _, image_bytes, _ in todo)]
+
+    output = await run_agent_with_retries(
+        agent, message_parts, output_type, estimate_request_tokens(request_prompt, len(todo)), page_names
+    )
+    if output is None:
+        # Give up on these pages only - the rest of the document is still analyzed and
+        # saved. Failed results aren't cached, so the pages are retried on the next run.
+        for idx, page_name, _, _ in todo:
+            results[idx] = Results(filename=page_name, result=FAILED_PAGE_RESULT)
+        return results
+
+    outputs = output if len(todo) > 1 else [output]
+    if len(outputs) != len(todo):
+        # The model merged or skipped pages, so the outputs can't be matched to the
+        # pages - analyze each page of the batch in its own request instead
+        log.warning(f"Got {len(outputs)} outputs for {len(todo)} pages ({page_names}), analyzing them one by one")
+        single_results = await asyncio.gather(
+            *(run_inference(agent, prompt, [(page_name, image_bytes)]) for _, page_name, image_bytes, _ in todo)
+        )
+        for (idx, _, _, _), (result,) in zip(todo, single_results, strict=True):
+            results[idx] = result
+        return results
+
+    await asyncio.to_thread(CACHE_DIR.mkdir, parents=True, exist_ok=True)
+    for (idx, page_name, _, cache_path), output in zip(todo, outputs, strict=True):
+        # Written atomically - an interrupted run must not leave a truncated entry,
+        # which would be discarded and paid for again on the next run
+        await asyncio.to_thread(write_file_atomically, cache_path, output_adapter.dump_json(output))
+        results[idx] = wrap_output(page_name, output)
+    return results
+
+
+async def run_agent_with_retries(
+    agent: Agent, message_parts: list, output_type: object, estimated_tokens: int, page_names: str
+) -> object | None:
+    """Run the agent within the concurrency limits, retrying transient failures.
+
+    Args:
+        agent (Agent): an Agent or LLM model used to run the inference with
+        message_parts (list): the prompt followed by the analyzed images
+        output_type (object): output type of this run
+        estimated_tokens (int): tokens charged against the tokens-per-minute limit (see `estimate_request_tokens`)
+        page_names (str): names of the analyzed pages, used in log messages
+
+    Returns:
+        object | None: output of the agent, or None if it still failed after MAX_RETRIES retries
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with admission, rate_limiter:
+                await token_limiter.acquire(estimated_tokens)
+                # Run the agent with the images and prompt.
+                # The LLM analyzes the images according to the system_prompt and output_type.
+                analysis_result = await agent.run(message_parts, output_type=output_type)
+            log.info(f"File analyzed: {page_names}")
+            if OCR_DEBUG:
+                # Loguru formats the message only if it's actually logged
+                log.debug("Output for {}: {}", page_names, analysis_result.output)
+            return analysis_result.output
+        except ModelAPIError as e:
+            # Connection errors and timeouts have no status code and are always worth retrying
+            is_http_error = isinstance(e, ModelHTTPError)
+            if is_http_error and e.status_code not in RETRYABLE_STATUS_CODES:
+                log.warning(f"Unexpected error while inference: {e}")
+                raise RuntimeError from e
+            if attempt == MAX_RETRIES:
+                log.error(f"Giving up on {page_names} after {MAX_RETRIES} retries: {e}")
+                return None
+            # Wait as long as the API asks for. Otherwise back off exponentially with
+            # "full jitter" - a random wait of up to 1s, 2s, 4s, ... - so pages that
+            # failed together don't all retry at the same moment again
+            headers = getattr(e, "headers", None) or {}
+            try:
+                delay = float(headers.get("retry-after", ""))
+            except ValueError:
+                delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, 2.0**attempt))  # noqa: S311
+            reason = f"HTTP {e.status_code}" if is_http_error else type(e.__cause__ or e).__name__
+            log.warning(f"Request for {page_names} failed with {reason}, retrying in {delay:.1f}s")
+            # Sleep outside of the admission, so other requests can use the slot meanwhile
+            await asyncio.sleep(delay)
+        except Exception as e:
+            log.warning(f"Unexpected error while inference: {e}")
+            raise RuntimeError from e
+
+
+def estimate_request_tokens(prompt: str, page_count: int = 1) -> int:
+    """Estimate the tokens a page request counts against the tokens-per-minute limit.
+
+    Args:
+        prompt (str): textual analysis instructions for the Agent/LLM model
+        page_count (int): number of pages sent in the request. Defaults to 1.
+
+    Returns:
+        int: estimated input and output tokens of the request
+    """
+    # ~4 characters per token is a good approximation for English text
+    return len(prompt) // 4 + page_count * (IMAGE_TOKENS_PER_PAGE + OUTPUT_TOKENS_PER_PAGE)
+
+
+def get_agent_fingerprint(agent: Agent) -> bytes:
+    """Describe everything about an agent that affects its answers, for the page cache key.
+
+    Covers the model (provider and name), the static system prompts, the
+    `@agent.system_prompt` functions, the instructions and the model settings of both
+    the model and the agent. pydantic-ai has no public accessor for an agent's system
+    prompts and instructions, so they're read from its attributes. Functions are
+    identified by their name and source code, so editing a system prompt function
+    changes the key; what such a function returns at run time is not covered.
+
+    Args:
+        agent (Agent): the Agent used to run the inference
+
+    Returns:
+        bytes: JSON description of the agent
+    """
+    model = agent.model
+    is_model = isinstance(model, Model)
+    fingerprint = {
+        "model": f"{model.system}:{model.model_name}" if is_model else str(model),
+        "model_settings": model.settings if is_model else None,
+        "agent_settings": agent.model_settings,
+        "system_prompts": getattr(agent, "_system_prompts", ()),
+        "system_prompt_functions": getattr(agent, "_system_prompt_functions", ()),
+        "instructions": getattr(agent, "_instructions", None),
+    }
+    return to_json(fingerprint, fallback=describe_callable)
+
+
+def describe_callable(value: object) -> str:
+    """Describe a value `to_json` can't serialize - usually a prompt function - for `get_agent_fingerprint`.
+
+    Args:
+        value (object): the value to describe
+
+    Returns:
+        str: name and source code of a function, `repr()` of anything else
+    """
+    name = getattr(value, "__qualname__", None)
+    if name is None:
+        return repr(value)
+    try:
+        return f"{name}:{inspect.getsource(value)}"  # type: ignore[arg-type]
+    except (OSError, TypeError):
+        # Built-ins and functions defined interactively have no source to read
+        return name
+
+
+def load_cached_output(cache_path: Path, output_adapter: TypeAdapter) -> object | None:
+    """Load the cached output of a page.
+
+    Args:
+        cache_path (Path): cache file of the page
+        output_adapter (TypeAdapter): adapter of the agent's output type (see `get_output_adapter`)
+
+    Returns:
+        object | None: the cached output, or None if the page isn't cached or the cached
+            result no longer validates - such a file is deleted, so the page is analyzed again
+    """
+    try:
+        return output_adapter.validate_json(cache_path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except ValidationError as e:
+        log.warning(f"Discarding outdated cache file {cache_path.name}: {e.error_count()} validation error(s)")
+        cache_path.unlink(missing_ok=True)
+        return None
+
+
+def page_cache_key(agent_id: bytes, prompt: str, output_schema: bytes, image_bytes: bytes) -> str:
+    """Build the result cache key of a single page.
+
+    blake2b from the standard library is used - it's faster than sha256 and
+    needs no extra dependency.
+
+    Args:
+        agent_id (bytes): model, system prompts and settings of the agent (see `get_agent_fingerprint`)
+        prompt (str): textual analysis instructions for the Agent/LLM model
+        output_schema (bytes): JSON schema of the agent's output type (see `get_output_schema`)
+        image_bytes (bytes): content of the analyzed image
+
+    Returns:
+        str: hex digest identifying the page analysis
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    for part in (agent_id, prompt.encode(), output_schema, image_bytes):
+        # Length prefix keeps the parts from running into each other
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def wrap_output(page_name: str, analysis_output: ModelAnalysisOutput | str) -> Results | OCROutput:
+    """Wrap the analysis of a page together with its filename.
+
+    The output format depends on whether we used structured output:
+    - If ModelAnalysisOutput: Wrap in OCROutput with filename
+    - If unstructured: Wrap in Results with filename
+
+    Args:
+        page_name (str): name of the analyzed page
+        analysis_output (ModelAnalysisOutput | str): output of the Agent/LLM model
+
+    Returns:
+        Results | OCROutput: Pydantic object containing filename and analysis result data
+    """
+    if isinstance(analysis_output, ModelAnalysisOutput):
+        return OCROutput(filename=page_name, analysis_result=analysis_output)
+    return Results(filename=page_name, result=analysis_output)
+
+
+class JsonlWriter:
+    """Appends page results to a JSON Lines file as soon as each page is analyzed.
+
+    The file holds one JSON record per line, in the order the pages finish. It
+    shows progress while long PDFs are still being processed, and it keeps the
+    already analyzed pages if the run is interrupted. The file is emptied when
+    the writer is created, so every run starts with a fresh file.
+
+    The file is opened once and kept open until the writer is closed, so a single
+    writer can collect the pages of all PDFs of a run; each line is flushed to the
+    OS as it's written.
+
+    Usage:
+        with JsonlWriter(Path("./files/results/results.jsonl")) as writer:
+            await writer.write(result)
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Concurrent pages append through worker threads - the lock keeps their lines apart
+        self.lock = asyncio.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, "wb")  # noqa: SIM115 - closed by close() / the with block
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the file; lines already written stay in it."""
+        self.file.close()
+
+    async def write(self, result: Results | OCROutput) -> None:
+        """Append a single page result as one line.
+
+        Args:
+            result (Results | OCROutput): analysis result of a page
+        """
+        line = result.__pydantic_serializer__.to_json(result) + b"\n"
+        async with self.lock:
+            await asyncio.to_thread(self.append, line)
+
+    def append(self, line: bytes) -> None:
+        self.file.write(line)
+        # Make the line visible to readers (and safe from a crash of this process) right away
+        self.file.flush()
+
+
+async def analyze_each_page(
+    agent: Agent, prompt: str, pages: AsyncIterable[tuple[str, bytes]], writer: JsonlWriter | None = None
+) -> list[Results | OCROutput]:
+    """Analyze multiple images in parallel, starting each one as soon as it is available.
+
+    This leverages async/await to process multiple pages concurrently,
+    significantly faster than processing them one by one.
+    Each page (or batch of BATCH_PAGES pages) is scheduled the moment `pages`
+    yields it, so inference of the first pages overlaps with rendering of the
+    remaining ones.
+    The admission controller prevents overwhelming the API with too many requests.
+
+    Args:
+        agent (Agent): an Agent to perform the analysis
+        prompt (str): prompt used for the analysis
+        pages (AsyncIterable[tuple[str, bytes]]): page names and images to be analyzed, e.g. from `pdf_to_jpg`
+        writer (JsonlWriter | None): if set, every page result is also appended to it as soon as it's ready
+
+    Returns:
+        list[Results | OCROutput]: a list of Results objects containing analysis results, in page order
+    """
+
+    async def analyze_batch(batch: list[tuple[str, bytes]]) -> list[Results | OCROutput]:
+        try:
+            results = await run_inference(agent, prompt, batch)
+        except Exception as e:
+            # One bad page must not fail (and cancel) the whole document:
+            # it's saved as failed and the other pages are kept
+            log.error(f"Analysis of {', '.join(page_name for page_name, _ in batch)} failed: {e.__cause__ or e!r}")
+            results = [Results(filename=page_name, result=FAILED_PAGE_RESULT) for page_name, _ in batch]
+        if writer:
+            for result in results:
+                await writer.write(result)
+        return results
+
+    tasks = []
+    batch = []
+    try:
+        async for page in pages:
+            batch.append(page)
+            if len(batch) == BATCH_PAGES:
+                tasks.append(asyncio.create_task(analyze_batch(batch)))
+                batch = []
+        if batch:
+            tasks.append(asyncio.create_task(analyze_batch(batch)))
+        # asyncio.gather() waits for all tasks to complete and returns results in order
+        return [result for results in await asyncio.gather(*tasks) for result in results]
+    except BaseException:
+        # Don't leave requests running in the background when rendering or a request failed
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def save_results_to_json(prefix: str | None, base_filename: str, results: list[Results | OCROutput], save_dir: Path) -> None:
+    """Save analysis results to a JSON file.
+
+    Each analysis produces a JSON file with all the extracted data.
+    This allows further processing or archiving of results.
+
+    Args:
+        prefix (str | None): prefix to be used for saved files (e.g., 'structured')
+        base_filename (str): filename of the base file (the one analysis started from)
+        results (list[Results | OCROutput]): a list of Results objects (one per page)
+        save_dir (Path): existing directory to save the resulting JSON file in
+    """
+    if prefix:
+        base_filename = f"{prefix}_{base_filename}"
+
+    save_path = Path(save_dir, f"{base_filename}.json")
+    # The models are serialized by pydantic-core in a single pass straight to UTF-8 JSON bytes
+    # (no intermediate dicts), keeping unicode characters from OCR as they are
+    data = results_adapter.dump_json(results, indent=2)
+    # Writing runs in a worker thread, so large results don't stall the event loop
+    await asyncio.to_thread(write_file_atomically, save_path, data)
+
+
+def write_file_atomically(path: Path, data: bytes) -> None:
+    """Write a file so that it either has the new content or stays untouched.
+
+    The data goes to a temporary sibling first, which then replaces the target in a
+    single rename. A crash mid-write never leaves a truncated file behind.
+    Every write gets its own temporary file, so concurrent writes of the same
+    path (e.g. two identical pages cached at once) don't clash.
+    The whole content is written in one call, flushed and synced to disk before
+    the rename, so even a power loss can't leave a renamed but empty file.
+
+    Args:
+        path (Path): path of the file to write
+        data (bytes): new content of the file
+    """
+    # Writes run in worker threads (asyncio.to_thread) - one temporary file per thread
+    tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        # Larger than the buffer, the data goes straight to the OS - no extra copy
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp_path.replace(path)